@@ -1,168 +1,214 @@
-import networkx as nx
 import random
+import os
+import matplotlib
+# Render off-screen unless SHOW_PLOTS is set, so batch runs never start a GUI backend
+if not os.environ.get('SHOW_PLOTS'):
+    matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 from collections import defaultdict
+from functools import lru_cache
 import numpy as np
+import scipy.sparse
+from numba import njit
 
 # --- Configuration ---
 NUM_NODES = 50
 FREE_RIDER_RATIO = 0.3  # 30% of nodes will be free-riders
 SIMULATION_TIME = 10
 
+# Protocol modes
+MODE_CONVENTIONAL = 0  # Standard gossip with no incentives
+MODE_GAME = 1          # Relaying earns stake; free-riders can be punished
+
+@njit(cache=True)
+def _relay(u, n_sent, mode, sent, relay_count, stake):
+    """Accounts for node u relaying a message to n_sent peers."""
+    sent[u] += n_sent
+    if mode == MODE_GAME:
+        # Honest nodes relay and earn rewards, paid out every 5 relays
+        relay_count[u] += n_sent
+        if relay_count[u] >= 5:
+            stake[u] += relay_count[u] * 0.1
+            relay_count[u] = 0
+
+@njit(cache=True)
+def _bfs_gossip(indptr, indices, is_free_rider, src, N, mode, sent, relay_count, stake):
+    """Floods a message from src over a CSR graph; free-riders receive but never relay.
+
+    Relays are added to sent and, in MODE_GAME, rewarded through relay_count/stake.
+    """
+    visited = np.zeros(N, np.bool_)
+    recv_step = np.full(N, -1, np.int16)  # Steps are bounded by N - 1
+    frontier = np.empty(N, np.int32)
+    next_frontier = np.empty(N, np.int32)
+
+    visited[src] = True
+    recv_step[src] = 0
+    frontier[0] = src
+    f_end = 1
+    step = 0
+    while f_end:
+        step += 1
+        nf = 0
+        for i in range(f_end):
+            u = frontier[i]
+            if is_free_rider[u]:
+                continue
+            # Relay to all peers except the one we heard it from
+            _relay(u, indptr[u + 1] - indptr[u] - (u != src), mode, sent, relay_count, stake)
+            for k in range(indptr[u], indptr[u + 1]):
+                v = indices[k]
+                if not visited[v]:
+                    visited[v] = True
+                    recv_step[v] = step
+                    next_frontier[nf] = v
+                    nf += 1
+        frontier, next_frontier = next_frontier, frontier
+        f_end = nf
+    return recv_step, visited.sum()
+
+@lru_cache(maxsize=None)
+def make_bfs(N):
+    """Returns a flood kernel specialised for a fixed number of nodes N.
+
+    For N <= 64 the frontier and each node's peers are single uint64 bitsets
+    (adj_bits), so expanding a level is one OR per relaying node. Larger
+    networks use _bfs_gossip with N baked in as a constant.
+    """
+    if N > 64:
+        @njit(cache=True)
+        def _bfs(indptr, indices, adj_bits, is_free_rider, src, mode, sent, relay_count, stake):
+            return _bfs_gossip(indptr, indices, is_free_rider, src, N, mode, sent, relay_count, stake)
+        return _bfs
+
+    bits = np.left_shift(np.uint64(1), np.arange(N, dtype=np.uint64))
+
+    @njit(cache=True)
+    def _bfs(indptr, indices, adj_bits, is_free_rider, src, mode, sent, relay_count, stake):
+        recv_step = np.full(N, -1, np.int16)
+        recv_step[src] = 0
+        visited = bits[src]
+        frontier = bits[src]
+        reached = 1
+        step = 0
+        while frontier:
+            step += 1
+            next_frontier = np.uint64(0)
+            for u in range(N):
+                if not (frontier & bits[u]) or is_free_rider[u]:
+                    continue
+                _relay(u, indptr[u + 1] - indptr[u] - (u != src), mode, sent, relay_count, stake)
+                next_frontier |= adj_bits[u]
+            frontier = next_frontier & ~visited
+            visited |= frontier
+            for v in range(N):
+                if frontier & bits[v]:
+                    recv_step[v] = step
+                    reached += 1
+        return recv_step, reached
+    return _bfs
+
 class Network:
-    """A simple network to hold all nodes and global state."""
-    def __init__(self):
-        self.nodes = {}
+    """A simple network to hold all nodes and global state.
+
+    Per-node state lives in NumPy arrays indexed by node id; mode selects
+    between conventional and game-theoretic gossip.
+    """
+    def __init__(self, num_nodes, mode, seed=None, initial_stake=100):
+        self.num_nodes = num_nodes
+        self.mode = mode
         self.propagation_data = {}  # Tracks when each node received each message
         self.current_message_id = 0
+        self.adj = None  # adj[u, v] is True while u and v are peers
+        # CSR adjacency (indptr, indices), kept in step with adj by rebuild_csr
+        self.indptr = None
+        self.indices = None
+        self.degree = None
+        # Peer bitsets for make_bfs; only filled in when num_nodes <= 64
+        self.adj_bits = np.zeros(0, dtype=np.uint64)
+        self.is_free_rider = np.zeros(num_nodes, dtype=bool)
+        self.sent = np.zeros(num_nodes, dtype=np.int32)  # Messages relayed per node
+        self.stake = np.full(num_nodes, float(initial_stake))
+        self.relay_count = np.zeros(num_nodes, dtype=np.int32)
+        self.rng = np.random.default_rng(seed)
+        self._flood = make_bfs(num_nodes)
+
+    def rebuild_csr(self):
+        """Refreshes the CSR view of adj; call after any change to adj."""
+        adjacency = scipy.sparse.csr_matrix(self.adj)
+        self.indptr = adjacency.indptr
+        self.indices = adjacency.indices
+        self.degree = np.diff(adjacency.indptr)
 
     def broadcast_message(self, source_id):
-        """Starts a new message from a source node."""
+        """Floods a new message from a source node (see make_bfs)."""
         msg_id = self.current_message_id
         self.current_message_id += 1
-        self.propagation_data[msg_id] = {}
-        # The source node instantly "receives" the message
-        self.nodes[source_id].receive_message(msg_id, None)
+        receive_step, _ = self._flood(self.indptr, self.indices, self.adj_bits, self.is_free_rider,
+                                      source_id, self.mode, self.sent, self.relay_count, self.stake)
+        self.propagation_data[msg_id] = receive_step
         return msg_id
 
+    def punish_free_rider(self, punisher_id, target_id):
+        """Punish a free-riding node by disconnecting and slashing stake."""
+        adj = self.adj
+        if self.is_free_rider[target_id] and adj[punisher_id, target_id]:
+            # Disconnect from the free-rider
+            adj[punisher_id, target_id] = adj[target_id, punisher_id] = False
+            self.rebuild_csr()  # Later broadcasts must not flood over the cut edge
+            if len(self.adj_bits):
+                self.adj_bits[punisher_id] &= ~(np.uint64(1) << np.uint64(target_id))
+                self.adj_bits[target_id] &= ~(np.uint64(1) << np.uint64(punisher_id))
+            # Slash the free-rider's stake
+            self.stake[target_id] -= self.stake[target_id] * 0.2
+
     def analyze_propagation(self, msg_id):
         """Analyzes how well a message propagated."""
         if msg_id not in self.propagation_data:
             return 0, 0
-        
-        receive_times = list(self.propagation_data[msg_id].values())
-        nodes_reached = len(receive_times)
-        propagation_time = max(receive_times) if receive_times else 0
-        
-        return nodes_reached, propagation_time
-
-class BaseNode:
-    """Base class for all node types."""
-    def __init__(self, node_id, network):
-        self.id = node_id
-        self.network = network
-        self.peers = []
-        self.received_messages = set()
-        self.sent_messages = 0
-        self.is_free_rider = False
-
-    def add_peer(self, peer_id):
-        self.peers.append(peer_id)
-
-    def receive_message(self, msg_id, source_id):
-        """Called when a message arrives at this node."""
-        # If we've already seen this message, do nothing (prevent loops)
-        if msg_id in self.received_messages:
-            return
-            
-        # Record the time we received this message
-        current_time = len(self.received_messages)  # Simple模拟时间
-        self.network.propagation_data[msg_id][self.id] = current_time
-        self.received_messages.add(msg_id)
-        
-        # FREE-RIDER BEHAVIOR: If this node is a free-rider, it stops here.
-        if self.is_free_rider:
-            return
-            
-        # NORMAL BEHAVIOR: Relay to all peers (except the sender)
-        for peer_id in self.peers:
-            if peer_id == source_id:
-                continue
-            self.sent_messages += 1
-            # Simulate network delay by adding a small random time
-            delay = random.random()
-            # In a real sim, we'd schedule this. Here we just call directly.
-            self.network.nodes[peer_id].receive_message(msg_id, self.id)
-
-class ConventionalNode(BaseNode):
-    """Standard gossip node with no incentives. Free-riders can exploit this."""
-    pass
-
-class GameTheoryNode(BaseNode):
-    """Game-theoretic node that punishes free-riders."""
-    def __init__(self, node_id, network, initial_stake=100):
-        super().__init__(node_id, network)
-        self.stake = initial_stake
-        self.relay_count = 0
-        
-    def receive_message(self, msg_id, source_id):
-        if msg_id in self.received_messages:
-            return
-            
-        current_time = len(self.received_messages)
-        self.network.propagation_data[msg_id][self.id] = current_time
-        self.received_messages.add(msg_id)
-        
-        if self.is_free_rider:
-            return  # Free-riders still don't relay
-            
-        # Honest nodes relay and earn rewards
-        for peer_id in self.peers:
-            if peer_id == source_id:
-                continue
-            self.sent_messages += 1
-            self.relay_count += 1
-            self.network.nodes[peer_id].receive_message(msg_id, self.id)
-        
-        # Periodically reward honest behavior
-        if self.relay_count >= 5:
-            self.stake += self.relay_count * 0.1
-            self.relay_count = 0
-            
-    def punish_free_rider(self, target_id):
-        """Punish a free-riding node by disconnecting and slashing stake."""
-        target = self.network.nodes[target_id]
-        if target.is_free_rider and target_id in self.peers:
-            # Disconnect from the free-rider
-            self.peers.remove(target_id)
-            if self.id in target.peers:
-                target.peers.remove(self.id)
-            # Slash the free-rider's stake
-            target.stake -= target.stake * 0.2
 
-def create_network(node_type, free_rider_ratio):
+        receive_step = self.propagation_data[msg_id]
+        return int((receive_step >= 0).sum()), int(receive_step.max())
+
+def create_network(node_type, free_rider_ratio, seed=None):
     """Creates a network with the specified node type and free-rider ratio."""
-    net = Network()
-    graph = nx.erdos_renyi_graph(n=NUM_NODES, p=0.15)
-    
-    # Create nodes
-    free_rider_ids = random.sample(range(NUM_NODES), int(NUM_NODES * free_rider_ratio))
-    for i in range(NUM_NODES):
-        is_free_rider = i in free_rider_ids
-        if node_type == "conventional":
-            node = ConventionalNode(i, net)
-        else:
-            node = GameTheoryNode(i, net)
-        node.is_free_rider = is_free_rider
-        net.nodes[i] = node
-    
+    mode = MODE_CONVENTIONAL if node_type == "conventional" else MODE_GAME
+    net = Network(NUM_NODES, mode, seed)
+    # Erdos-Renyi G(n, p=0.15): draw each node pair once from the upper triangle
+    upper = np.triu(net.rng.random((NUM_NODES, NUM_NODES)) < 0.15, k=1)
+
+    # Mark free-riders
+    free_rider_ids = net.rng.choice(NUM_NODES, size=int(NUM_NODES * free_rider_ratio), replace=False)
+    net.is_free_rider[free_rider_ids] = True
+
     # Connect nodes based on the graph
-    for edge in graph.edges():
-        node1, node2 = edge
-        net.nodes[node1].add_peer(node2)
-        net.nodes[node2].add_peer(node1)
-    
+    net.adj = upper | upper.T
+    net.rebuild_csr()
+    if NUM_NODES <= 64:
+        bits = np.left_shift(np.uint64(1), np.arange(NUM_NODES, dtype=np.uint64))
+        net.adj_bits = np.bitwise_or.reduce(np.where(net.adj, bits, np.uint64(0)), axis=1)
+
     return net
 
 def run_simulation(net):
     """Runs a simulation on the given network."""
     # Start a message from a random honest node
-    honest_nodes = [node_id for node_id, node in net.nodes.items() if not node.is_free_rider]
-    source_id = random.choice(honest_nodes)
+    honest_nodes = np.flatnonzero(~net.is_free_rider)
+    source_id = int(random.choice(honest_nodes))
     
     msg_id = net.broadcast_message(source_id)
     
     # For game theory network, occasionally punish free-riders
-    if isinstance(net.nodes[0], GameTheoryNode):
+    if net.mode == MODE_GAME:
         for _ in range(5):  # 5 punishment attempts
             punisher_id = random.choice(honest_nodes)
-            target_id = random.choice(list(net.nodes.keys()))
+            target_id = random.randrange(net.num_nodes)
             if target_id != punisher_id:
-                net.nodes[punisher_id].punish_free_rider(target_id)
+                net.punish_free_rider(punisher_id, target_id)
     
     # Analyze results
     nodes_reached, prop_time = net.analyze_propagation(msg_id)
-    total_messages = sum(node.sent_messages for node in net.nodes.values())
+    total_messages = int(net.sent.sum())
     
     return nodes_reached, total_messages
 
@@ -219,15 +265,16 @@ def main():
                 f'{value}', ha='center')
     
     plt.tight_layout()
-    plt.savefig('gossip_comparison_simple.png', dpi=100, bbox_inches='tight')
-    plt.show()
+    plt.savefig('gossip_comparison_simple.png', dpi=100)
+    if os.environ.get('SHOW_PLOTS'):
+        plt.show()
     
     # Show stake of free-riders in game-theoretic version
-    if isinstance(game_net.nodes[0], GameTheoryNode):
-        free_rider_stakes = [node.stake for node in game_net.nodes.values() if node.is_free_rider]
+    if game_net.mode == MODE_GAME:
+        free_rider_stakes = game_net.stake[game_net.is_free_rider]
         print(f"\nGame Theory Free-Rider Stake Analysis:")
         print(f"  Average stake: {np.mean(free_rider_stakes):.1f}")
-        print(f"  Minimum stake: {min(free_rider_stakes):.1f}")
+        print(f"  Minimum stake: {free_rider_stakes.min():.1f}")
         print("  (Free-riders are being punished economically)")
 
 if __name__ == "__main__":
@@ -1,5 +1,10 @@
 import networkx as nx
 import random
+import os
+import matplotlib
+# Render off-screen unless SHOW_PLOTS is set, so batch runs never start a GUI backend
+if not os.environ.get('SHOW_PLOTS'):
+    matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import numpy as np
 
@@ -12,17 +17,34 @@ import numpy as np
 NUM_NODES = 30
 FREE_RIDER_RATIO = 0.3  # Slightly lower ratio
 NETWORK_CONNECTIVITY = 0.15  # Increased from 0.08 to 0.15. This is the key fix.
+MESSAGE_ROWS = 10  # Initial per-message rows for dedup and relay monitoring; doubled as needed
+
+def grow_rows(rows):
+    """Returns a copy of rows with twice as many rows, the new ones all False."""
+    grown = np.zeros((2 * len(rows), rows.shape[1]), dtype=rows.dtype)
+    grown[:len(rows)] = rows
+    return grown
 
 class Network:
-    def __init__(self):
+    def __init__(self, seed=None):
         self.nodes = {}
         self.propagation_data = {}
         self.current_message_id = 0
         self.steps = 0  # Global simulation time counter
+        self.adj = None  # adj[u, v] is True while u and v are peers
+        self.neighbors = None  # Initial peers of each node, as slices of one CSR index array
+        # received[msg_id, node_id] / relayed_mask[msg_id, node_id] are True once
+        # node_id has received / relayed msg_id
+        self.received = np.zeros((MESSAGE_ROWS, NUM_NODES), dtype=bool)
+        self.relayed_mask = np.zeros((MESSAGE_ROWS, NUM_NODES), dtype=bool)
+        self.rng = np.random.default_rng(seed)
 
     def broadcast_message(self, source_id):
         msg_id = self.current_message_id
         self.current_message_id += 1
+        if msg_id >= len(self.received):
+            self.received = grow_rows(self.received)
+            self.relayed_mask = grow_rows(self.relayed_mask)
         self.propagation_data[msg_id] = {}
         self.steps = 0  # Reset time for new message
         # The source node starts the message
@@ -36,6 +58,14 @@ class Network:
         """Advance simulation by one step. In a real sim, this would handle queued events."""
         self.steps += 1
 
+    def peers_of(self, node_id, exclude=None):
+        """Current peers of node_id, optionally leaving out one peer (e.g. the sender)."""
+        nbrs = self.neighbors[node_id]
+        alive = self.adj[node_id, nbrs]  # False for links cut by punishment
+        if exclude is not None:
+            alive &= nbrs != exclude
+        return nbrs[alive]
+
     def analyze_propagation(self, msg_id):
         if msg_id not in self.propagation_data:
             return 0, 0
@@ -48,31 +78,24 @@ class BaseNode:
     def __init__(self, node_id, network):
         self.id = node_id
         self.network = network
-        self.peers = []
-        self.received_messages = set()
         self.sent_messages = 0
         self.is_free_rider = False
 
-    def add_peer(self, peer_id):
-        if peer_id not in self.peers:
-            self.peers.append(peer_id)
-
     def receive_message(self, msg_id, source_id):
-        if msg_id in self.received_messages:
+        if self.network.received[msg_id, self.id]:
             return  # Already seen
 
         # Record reception time (current simulation step)
         self.network.propagation_data[msg_id][self.id] = self.network.steps
-        self.received_messages.add(msg_id)
+        self.network.received[msg_id, self.id] = True
 
         # FREE-RIDER BEHAVIOR: Critical change! Free-riders do NOT relay.
         if self.is_free_rider:
             return  # This is the exploit. They break the protocol.
+        self.network.relayed_mask[msg_id, self.id] = True
 
         # NORMAL BEHAVIOR: Relay to all peers (except the sender)
-        for peer_id in self.peers:
-            if peer_id == source_id:
-                continue
+        for peer_id in self.network.peers_of(self.id, source_id):
             self.sent_messages += 1
             # In this simple model, we assume the message is sent instantly,
             # but the receiving node will process it on the next 'step'
@@ -95,13 +118,7 @@ class GameTheoryNode(BaseNode):
     def __init__(self, node_id, network, initial_stake=100):
         super().__init__(node_id, network)
         self.stake = initial_stake
-        self.suspicion_level = {}  # Maps peer_id to a suspicion score
-        self.message_buffer = []   # Buffer of recent messages to check for propagation
-
-    def receive_message(self, msg_id, source_id):
-        super().receive_message(msg_id, source_id)
-        if not self.is_free_rider:
-            self.message_buffer.append((msg_id, source_id))
+        self.suspicion_level = np.zeros(NUM_NODES, dtype=np.uint8)  # Suspicion score per peer, reset at 3
 
     def take_step(self, msg_id):
         """Game-theoretic logic: Monitor peers and punish bad actors."""
@@ -109,57 +126,49 @@ class GameTheoryNode(BaseNode):
             return  # Free-riders don't enforce rules
 
         # 1. Monitor: Check if messages I sent are being relayed.
-        for buffered_msg_id, source_id in self.message_buffer:
-            if buffered_msg_id != msg_id:
-                continue
-            for peer_id in self.peers:
-                if peer_id == source_id:
-                    continue
-                peer = self.network.nodes[peer_id]
-                # If my peer hasn't relayed this message, they are suspicious
-                if buffered_msg_id not in peer.received_messages:
-                    self.suspicion_level[peer_id] = self.suspicion_level.get(peer_id, 0) + 1
+        relayed = self.network.relayed_mask[msg_id]
+        if relayed[self.id]:
+            # If my peer hasn't relayed this message, they are suspicious.
+            # Whoever sent it to me has relayed it, so it never counts.
+            peer_ids = self.network.peers_of(self.id)
+            self.suspicion_level[peer_ids] += ~relayed[peer_ids]
 
         # 2. Punish: If a peer is highly suspicious, disconnect from them.
-        for peer_id, suspicion in list(self.suspicion_level.items()):
-            if suspicion > 2:  # Threshold for punishment
-                print(f"Node {self.id} punishing free-rider {peer_id} (suspicion: {suspicion})")
-                self.punish_peer(peer_id)
-                del self.suspicion_level[peer_id]
-
-        self.message_buffer = []  # Clear buffer after processing
+        for peer_id in np.flatnonzero(self.suspicion_level > 2):  # Threshold for punishment
+            print(f"Node {self.id} punishing free-rider {peer_id} (suspicion: {self.suspicion_level[peer_id]})")
+            self.punish_peer(peer_id)
+            self.suspicion_level[peer_id] = 0
 
     def punish_peer(self, peer_id):
         """Punish a non-relaying peer by disconnecting."""
-        if peer_id in self.peers:
-            self.peers.remove(peer_id)
+        adj = self.network.adj
+        adj[self.id, peer_id] = adj[peer_id, self.id] = False
         peer = self.network.nodes[peer_id]
-        if self.id in peer.peers:
-            peer.peers.remove(self.id)
         # Slashing stake is a powerful economic incentive
         peer.stake = max(0, peer.stake - 20)
         print(f"  Node {peer_id} slashed! New stake: {peer.stake}")
 
-def create_network(node_type, free_rider_ratio):
+def create_network(node_type, free_rider_ratio, seed=None):
     """Creates a SPARSE network."""
-    net = Network()
+    net = Network(seed)
     # Key Change: Use a much sparser network
     graph = nx.erdos_renyi_graph(n=NUM_NODES, p=NETWORK_CONNECTIVITY)
 
-    free_rider_ids = random.sample(range(NUM_NODES), int(NUM_NODES * free_rider_ratio))
+    free_rider_ids = net.rng.choice(NUM_NODES, size=int(NUM_NODES * free_rider_ratio), replace=False)
+    is_free_rider = np.zeros(NUM_NODES, dtype=bool)
+    is_free_rider[free_rider_ids] = True
     for i in range(NUM_NODES):
-        is_free_rider = i in free_rider_ids
         if node_type == "conventional":
             node = ConventionalNode(i, net)
         else:
             node = GameTheoryNode(i, net)
-        node.is_free_rider = is_free_rider
+        node.is_free_rider = bool(is_free_rider[i])
         net.nodes[i] = node
 
-    for edge in graph.edges():
-        node1, node2 = edge
-        net.nodes[node1].add_peer(node2)
-        net.nodes[node2].add_peer(node1)
+    net.adj = nx.to_numpy_array(graph, nodelist=range(NUM_NODES), dtype=bool)
+    indices = np.nonzero(net.adj)[1].astype(np.int32)
+    indptr = np.concatenate(([0], np.cumsum(net.adj.sum(axis=1))))
+    net.neighbors = [indices[indptr[i]:indptr[i + 1]] for i in range(NUM_NODES)]
 
     print(f"Created network with {graph.number_of_edges()} connections (avg degree: {sum(d for n, d in graph.degree()) / NUM_NODES:.2f})")
     return net
@@ -238,8 +247,9 @@ def main():
                 f'{value}', ha='center', va='bottom')
 
     plt.tight_layout()
-    plt.savefig('gossip_comparison_improved.png', dpi=120, bbox_inches='tight')
-    plt.show()
+    plt.savefig('gossip_comparison_improved.png', dpi=120)
+    if os.environ.get('SHOW_PLOTS'):
+        plt.show()
 
     # Show stake of free-riders in game-theoretic version
     if isinstance(game_net.nodes[0], GameTheoryNode):
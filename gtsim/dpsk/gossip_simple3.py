@@ -1,31 +1,48 @@
-import networkx as nx
 import random
+import os
+import matplotlib
+# Render off-screen unless SHOW_PLOTS is set, so batch runs never start a GUI backend
+if not os.environ.get('SHOW_PLOTS'):
+    matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import numpy as np
-from collections import deque
-from collections import defaultdict
+import itertools
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 
 # --- Configuration ---
 NUM_NODES = 30
 FREE_RIDER_RATIO = 0.3
 NETWORK_CONNECTIVITY = 0.15
+CALENDAR_SLOTS = 16  # Ring size of the message calendar; must exceed the longest delay (2 steps)
+UNIFORM_CHUNK = 4096  # Uniforms drawn per refill of Network.uniform_pool
 
 class Network:
-    def __init__(self):
+    def __init__(self, seed=None):
         self.nodes = {}
-        self.propagation_data = {}  # {message_id: {node_id: receive_step}}
+        self.propagation_data = {}  # {message_id: receive time per node id, -1 if never reached}
         self.current_message_id = 0
         self.step = 0
-        self.message_queue = deque()  # Queue of (delay, node_id, msg_id, source_id)
+        self.sent_messages = 0  # Relays sent by all nodes
+        # Calendar queue: slot int(arrival_step) % CALENDAR_SLOTS holds the
+        # (arrival_step, seq, node_id, msg_id, source_id) arriving during that step
+        self.message_slots = [[] for _ in range(CALENDAR_SLOTS)]
+        self.pending_messages = 0
+        self.message_seq = itertools.count()  # Tie-breaker: same-time messages stay FIFO
+        self.rng = np.random.default_rng(seed)
+        self.uniform_pool = np.empty(0)  # Pre-drawn uniforms for delays and node decisions
+        self.uniform_cursor = 0
 
     def broadcast_message(self, source_id):
         """Starts a new message from a source node."""
         self.step = 0
-        self.message_queue.clear()
+        for slot in self.message_slots:
+            slot.clear()
+        self.pending_messages = 0
         
         msg_id = self.current_message_id
         self.current_message_id += 1
-        self.propagation_data[msg_id] = {}
+        self.propagation_data[msg_id] = np.full(len(self.nodes), -1.0)
         
         # Source node gets the message at step 0
         self.propagation_data[msg_id][source_id] = 0
@@ -36,35 +53,52 @@ class Network:
             delay = 1  # Messages take at least 1 step to reach direct peers
             self.schedule_message(delay, peer_id, msg_id, source_id)
         
-        # Run the simulation for a fixed number of steps
-        for _ in range(15):  # Allow 15 steps for propagation
-            self.run_step()
+        self.run_until(15)  # Allow 15 steps for propagation
         return msg_id
 
+    def next_uniform(self):
+        """Returns the next pre-drawn uniform in [0, 1), refilling the pool when exhausted."""
+        if self.uniform_cursor == len(self.uniform_pool):
+            self.uniform_pool = self.rng.random(UNIFORM_CHUNK)
+            self.uniform_cursor = 0
+        u = self.uniform_pool[self.uniform_cursor]
+        self.uniform_cursor += 1
+        return u
+
     def schedule_message(self, delay, node_id, msg_id, source_id):
         """Schedule a message to arrive at a node after a delay."""
         arrival_step = self.step + delay
-        self.message_queue.append((arrival_step, node_id, msg_id, source_id))
+        slot = self.message_slots[int(arrival_step) % CALENDAR_SLOTS]
+        slot.append((arrival_step, next(self.message_seq), node_id, msg_id, source_id))
+        self.pending_messages += 1
 
-    def run_step(self):
-        """Process all messages that are due to arrive at this step."""
-        self.step += 1
-        # Process all messages scheduled for this current step
-        messages_to_process = []
-        while self.message_queue and self.message_queue[0][0] <= self.step:
-            messages_to_process.append(self.message_queue.popleft())
-        
-        for arrival_step, node_id, msg_id, source_id in messages_to_process:
-            self.nodes[node_id].receive_message(msg_id, source_id)
+    def run_until(self, deadline):
+        """Deliver messages in arrival order until none are left or the deadline passes."""
+        tick = 0
+        while self.pending_messages and tick <= deadline:
+            slot_index = tick % CALENDAR_SLOTS
+            # Relays scheduled below arrive at least 1 step later, so they always
+            # land in a later slot than the one being drained
+            slot = self.message_slots[slot_index]
+            self.message_slots[slot_index] = []
+            slot.sort()
+            for arrival_step, _, node_id, msg_id, source_id in slot:
+                if arrival_step > deadline:
+                    break
+                self.pending_messages -= 1
+                self.step = arrival_step
+                self.nodes[node_id].receive_message(msg_id, source_id)
+            tick += 1
 
     def analyze_propagation(self, msg_id):
         """Analyzes how well a message propagated."""
         if msg_id not in self.propagation_data:
             return 0, 0
         
-        receive_times = list(self.propagation_data[msg_id].values())
-        nodes_reached = len(receive_times)
-        propagation_time = max(receive_times) if receive_times else 0
+        receive_times = self.propagation_data[msg_id]
+        reached = receive_times >= 0
+        nodes_reached = int(reached.sum())
+        propagation_time = receive_times[reached].max() if nodes_reached else 0
         
         return nodes_reached, propagation_time
 
@@ -72,14 +106,12 @@ class BaseNode:
     def __init__(self, node_id, network):
         self.id = node_id
         self.network = network
-        self.peers = []
+        self.peers = {}  # Peer ids as keys: O(1) membership, iterated in the order added
         self.received_messages = set()
-        self.sent_messages = 0
         self.is_free_rider = False
 
     def add_peer(self, peer_id):
-        if peer_id not in self.peers:
-            self.peers.append(peer_id)
+        self.peers[peer_id] = None
 
     def receive_message(self, msg_id, source_id):
         """Called when a message arrives at this node."""
@@ -96,13 +128,18 @@ class BaseNode:
             return
             
         # NORMAL BEHAVIOR: Relay to all peers (except the sender)
+        network = self.network
+        schedule = network.schedule_message
+        next_uniform = network.next_uniform
+        my_id = self.id
+        sent = 0
         for peer_id in self.peers:
             if peer_id == source_id:
                 continue
-            self.sent_messages += 1
+            sent += 1
             # Schedule the message to arrive at the peer with a random delay
-            delay = 1 + random.random()  # 1-2 step delay
-            self.network.schedule_message(delay, peer_id, msg_id, self.id)
+            schedule(1 + next_uniform(), peer_id, msg_id, my_id)  # 1-2 step delay
+        network.sent_messages += sent
 
 class ConventionalNode(BaseNode):
     """Standard gossip node. Vulnerable to free-riders."""
@@ -115,12 +152,12 @@ class GameTheoryNode(BaseNode):
         self.stake = initial_stake
         self.suspicion_level = defaultdict(int)  # Tracks suspicion per peer
         self.connection_priority = {}  # Priority for maintaining connections
-        self.message_history = []      # Recent messages to analyze
+        self.message_history = deque()  # Recent (msg_id, source_id, step), oldest first
 
     def add_peer(self, peer_id):
         """Override to include connection priority."""
         if peer_id not in self.peers:
-            self.peers.append(peer_id)
+            self.peers[peer_id] = None
             # Ensure connection_priority exists before assigning to it
             if not hasattr(self, 'connection_priority'):
                 self.connection_priority = {}
@@ -133,16 +170,20 @@ class GameTheoryNode(BaseNode):
             return
             
         # Store message info for later analysis
-        self.message_history.append((msg_id, source_id, self.network.step))
-        # Keep only recent history
-        self.message_history = [m for m in self.message_history if self.network.step - m[2] < 10]
+        step = self.network.step
+        history = self.message_history
+        history.append((msg_id, source_id, step))
+        # Keep only recent history; entries arrive in time order, so expired
+        # ones are always at the front
+        while step - history[0][2] >= 10:
+            history.popleft()
         
         # Occasionally maintain connections (5% chance per message)
-        if random.random() < 0.05 and hasattr(self, 'maintain_connections'):
+        if self.network.next_uniform() < 0.05 and hasattr(self, 'maintain_connections'):
             self.maintain_connections()
             
         # Periodically analyze peer behavior (not on every message)
-        if random.random() < 0.2:  # 20% chance to analyze
+        if self.network.next_uniform() < 0.2:  # 20% chance to analyze
             self.analyze_peer_behavior()
 
     def analyze_peer_behavior(self):
@@ -151,33 +192,35 @@ class GameTheoryNode(BaseNode):
             return
             
         # Check which peers should have relayed recent messages but didn't
-        recent_msgs = set(msg[0] for msg in self.message_history)
+        recent_msgs = {msg[0] for msg in self.message_history}
         
-        for peer_id in self.peers:
-            peer = self.network.nodes[peer_id]
+        nodes = self.network.nodes
+        suspicion = self.suspicion_level
+        # Snapshot: punish_peer may drop peers while we walk them
+        for peer_id in tuple(self.peers):
+            peer = nodes[peer_id]
             # Count how many recent messages the peer should have but doesn't
-            missing_count = sum(1 for msg_id in recent_msgs 
-                              if msg_id not in peer.received_messages)
+            missing_count = len(recent_msgs - peer.received_messages)
             
             if missing_count > 2:  # Only punish if consistently missing messages
-                self.suspicion_level[peer_id] += 1
+                suspicion[peer_id] += 1
                 
                 # Gradual punishment based on suspicion level
-                if self.suspicion_level[peer_id] == 1:
+                if suspicion[peer_id] == 1:
                     # First offense: just reduce priority
                     if not hasattr(self, 'connection_priority'):
                         self.connection_priority = {}
                     self.connection_priority[peer_id] = self.connection_priority.get(peer_id, 1) - 0.3
                     #print(f"Node {self.id} reduced priority of {peer_id}")
                     
-                elif self.suspicion_level[peer_id] >= 3:
+                elif suspicion[peer_id] >= 3:
                     # Multiple offenses: consider disconnection
-                    if random.random() < 0.7:  # 70% chance to disconnect
+                    if self.network.next_uniform() < 0.7:  # 70% chance to disconnect
                         self.punish_peer(peer_id)
                 
                 # Occasionally forgive if network is becoming too sparse
-                if len(self.peers) < 3 and random.random() < 0.4:
-                    self.suspicion_level[peer_id] = max(0, self.suspicion_level[peer_id] - 1)
+                if len(self.peers) < 3 and self.network.next_uniform() < 0.4:
+                    suspicion[peer_id] = max(0, suspicion[peer_id] - 1)
 
     def punish_peer(self, peer_id):
         """Punish a free-riding peer strategically."""
@@ -186,10 +229,10 @@ class GameTheoryNode(BaseNode):
             
         # Only disconnect if we have enough other connections
         if len(self.peers) > 4:  # Maintain minimum connectivity
-            self.peers.remove(peer_id)
+            del self.peers[peer_id]
             peer = self.network.nodes[peer_id]
             if self.id in peer.peers:
-                peer.peers.remove(self.id)
+                del peer.peers[self.id]
             
             # Slash stake but not too aggressively
             peer.stake = max(50, peer.stake - 10)  # Don't reduce below 50
@@ -208,8 +251,7 @@ class GameTheoryNode(BaseNode):
             
             if potential_peers:
                 # Prefer nodes with higher stake (likely more reliable)
-                potential_peers.sort(key=lambda x: self.network.nodes[x].stake, reverse=True)
-                new_peer = potential_peers[0]  # Connect to the node with highest stake
+                new_peer = max(potential_peers, key=lambda x: self.network.nodes[x].stake)  # Connect to the node with highest stake
                 self.add_peer(new_peer)
                 self.network.nodes[new_peer].add_peer(self.id)
                 #print(f"Node {self.id} added new peer {new_peer} for connectivity")
@@ -232,8 +274,9 @@ class GameTheoryNode(BaseNode):
         if source_id is not None and source_id in self.peers:
             # For simplicity, we'll just punish a random free-rider occasionally
             # A more sophisticated version would track message history
-            if random.random() < 0.3:  # 30% chance to check for punishment each message
-                potential_targets = [pid for pid in self.peers if self.network.nodes[pid].is_free_rider]
+            if self.network.next_uniform() < 0.3:  # 30% chance to check for punishment each message
+                nodes = self.network.nodes
+                potential_targets = [pid for pid in self.peers if nodes[pid].is_free_rider]
                 if potential_targets:
                     target_id = random.choice(potential_targets)
                     self.punish_peer(target_id)
@@ -241,38 +284,45 @@ class GameTheoryNode(BaseNode):
     def punish_peer(self, peer_id):
         """Punish a free-riding peer by disconnecting and slashing stake."""
         if peer_id in self.peers:
-            self.peers.remove(peer_id)
+            del self.peers[peer_id]
         
         peer = self.network.nodes[peer_id]
         if self.id in peer.peers:
-            peer.peers.remove(self.id)
+            del peer.peers[self.id]
             
         # Slash the free-rider's stake
         peer.stake = max(0, peer.stake - 25)
 
-def create_network(node_type, free_rider_ratio):
-    """Creates a network with the specified node type and free-rider ratio."""
-    net = Network()
-    graph = nx.erdos_renyi_graph(n=NUM_NODES, p=NETWORK_CONNECTIVITY)
+def random_graph(rng):
+    """Draws G(NUM_NODES, NETWORK_CONNECTIVITY) as a symmetric boolean adjacency matrix."""
+    # Each node pair is drawn once, from the upper triangle
+    upper = np.triu(rng.random((NUM_NODES, NUM_NODES)) < NETWORK_CONNECTIVITY, k=1)
+    return upper | upper.T
+
+def create_network(node_type, adj, free_rider_ratio, seed=None):
+    """Creates a network over the adjacency matrix adj with the specified node type and free-rider ratio."""
+    net = Network(seed)
     
     # Create nodes
-    free_rider_ids = random.sample(range(NUM_NODES), int(NUM_NODES * free_rider_ratio))
+    free_rider_ids = net.rng.choice(NUM_NODES, size=int(NUM_NODES * free_rider_ratio), replace=False)
+    is_free_rider = np.zeros(NUM_NODES, dtype=bool)
+    is_free_rider[free_rider_ids] = True
     for i in range(NUM_NODES):
-        is_free_rider = i in free_rider_ids
         if node_type == "conventional":
             node = ConventionalNode(i, net)
         else:
             node = GameTheoryNode(i, net)
-        node.is_free_rider = is_free_rider
+        node.is_free_rider = bool(is_free_rider[i])
         net.nodes[i] = node
     
-    # Connect nodes based on the graph
-    for edge in graph.edges():
-        node1, node2 = edge
-        net.nodes[node1].add_peer(node2)
-        net.nodes[node2].add_peer(node1)
+    # Connect nodes from the CSR rows of adj
+    indices = np.nonzero(adj)[1].tolist()
+    indptr = np.concatenate(([0], np.cumsum(adj.sum(axis=1)))).tolist()
+    for i, node in net.nodes.items():
+        for peer_id in indices[indptr[i]:indptr[i + 1]]:
+            node.add_peer(peer_id)
     
-    print(f"Created network with {graph.number_of_edges()} connections (avg degree: {sum(d for n, d in graph.degree()) / NUM_NODES:.2f})")
+    print(f"Created network with {len(indices) // 2} connections (avg degree: {len(indices) / NUM_NODES:.2f})")
     return net
 
 def run_simulation(net):
@@ -281,14 +331,30 @@ def run_simulation(net):
     honest_nodes = [node_id for node_id, node in net.nodes.items() if not node.is_free_rider]
     if not honest_nodes:
         return 0, 0
-    source_id = random.choice(honest_nodes)
+    source_id = int(net.rng.choice(honest_nodes))
     
     msg_id = net.broadcast_message(source_id)
     nodes_reached, prop_time = net.analyze_propagation(msg_id)
-    total_messages = sum(node.sent_messages for node in net.nodes.values())
+    total_messages = net.sent_messages
     
     return nodes_reached, total_messages
 
+def one_trial(seed):
+    """Simulates both protocols on one shared topology.
+
+    Returns the (nodes_reached, total_messages) of the conventional and the
+    game-theoretic run.
+    """
+    # The graph gets its own stream, independent of the networks' generators
+    adj = random_graph(np.random.default_rng(np.random.SeedSequence(seed).spawn(1)[0]))
+    results = []
+    for node_type in ("conventional", "game"):
+        # Same seed for both, so they also share free-riders and the source
+        random.seed(seed)
+        net = create_network(node_type, adj, FREE_RIDER_RATIO, seed)
+        results.append(run_simulation(net))
+    return tuple(results)
+
 def main():
     """Main function to compare both protocols."""
     print("=== Comparing Gossip Protocols ===")
@@ -296,25 +362,19 @@ def main():
     print(f"Connectivity: p={NETWORK_CONNECTIVITY}")
     print()
     
-    # Run multiple trials to get average results
+    # Run multiple trials to get average results. Trials are independent,
+    # so they run in parallel, each with its own seed.
     num_trials = 10
-    conv_results = []
-    game_results = []
+    seeds = np.random.SeedSequence().generate_state(num_trials).tolist()
+    with ProcessPoolExecutor() as ex:
+        results = list(ex.map(one_trial, seeds))
+    conv_results = [conv for conv, _ in results]
+    game_results = [game for _, game in results]
     
     for trial in range(num_trials):
         print(f"\n--- Trial {trial + 1}/{num_trials} ---")
-        
-        # Run conventional gossip simulation
-        conv_net = create_network("conventional", FREE_RIDER_RATIO)
-        conv_reached, conv_msgs = run_simulation(conv_net)
-        conv_results.append((conv_reached, conv_msgs))
-        print(f"Conventional: {conv_reached}/{NUM_NODES} nodes reached")
-        
-        # Run game-theoretic gossip simulation
-        game_net = create_network("game", FREE_RIDER_RATIO)
-        game_reached, game_msgs = run_simulation(game_net)
-        game_results.append((game_reached, game_msgs))
-        print(f"Game-Theoretic: {game_reached}/{NUM_NODES} nodes reached")
+        print(f"Conventional: {conv_results[trial][0]}/{NUM_NODES} nodes reached")
+        print(f"Game-Theoretic: {game_results[trial][0]}/{NUM_NODES} nodes reached")
     
     # Calculate averages
     avg_conv_reached = sum(r[0] for r in conv_results) / num_trials
@@ -363,8 +423,9 @@ def main():
                 f'{value:.1f}', ha='center', va='bottom')
     
     plt.tight_layout()
-    plt.savefig('gossip_comparison_final.png', dpi=120, bbox_inches='tight')
-    plt.show()
+    plt.savefig('gossip_comparison_final.png', dpi=120)
+    if os.environ.get('SHOW_PLOTS'):
+        plt.show()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,5 +1,10 @@
 import networkx as nx
 import random
+import os
+import matplotlib
+# Render off-screen unless SHOW_PLOTS is set, so batch runs never start a GUI backend
+if not os.environ.get('SHOW_PLOTS'):
+    matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import numpy as np
 from collections import deque
@@ -11,12 +16,13 @@ FREE_RIDER_RATIO = 0.3
 NETWORK_CONNECTIVITY = 0.15
 
 class Network:
-    def __init__(self):
+    def __init__(self, seed=None):
         self.nodes = {}
         self.propagation_data = {}  # {message_id: {node_id: receive_step}}
         self.current_message_id = 0
         self.step = 0
         self.message_queue = deque()  # Queue of (delay, node_id, msg_id, source_id)
+        self.rng = np.random.default_rng(seed)
 
     def broadcast_message(self, source_id):
         """Starts a new message from a source node."""
@@ -254,20 +260,21 @@ class GameTheoryNode(BaseNode):
         # Slash the free-rider's stake
         peer.stake = max(0, peer.stake - 25)
 
-def create_network(node_type, free_rider_ratio):
+def create_network(node_type, free_rider_ratio, seed=None):
     """Creates a network with the specified node type and free-rider ratio."""
-    net = Network()
+    net = Network(seed)
     graph = nx.erdos_renyi_graph(n=NUM_NODES, p=NETWORK_CONNECTIVITY)
     
     # Create nodes
-    free_rider_ids = random.sample(range(NUM_NODES), int(NUM_NODES * free_rider_ratio))
+    free_rider_ids = net.rng.choice(NUM_NODES, size=int(NUM_NODES * free_rider_ratio), replace=False)
+    is_free_rider = np.zeros(NUM_NODES, dtype=bool)
+    is_free_rider[free_rider_ids] = True
     for i in range(NUM_NODES):
-        is_free_rider = i in free_rider_ids
         if node_type == "conventional":
             node = ConventionalNode(i, net)
         else:
             node = GameTheoryNode(i, net)
-        node.is_free_rider = is_free_rider
+        node.is_free_rider = bool(is_free_rider[i])
         net.nodes[i] = node
     
     # Connect nodes based on the graph
@@ -367,8 +374,9 @@ def main():
                 f'{value:.1f}', ha='center', va='bottom')
     
     plt.tight_layout()
-    plt.savefig('gossip_comparison_final.png', dpi=120, bbox_inches='tight')
-    plt.show()
+    plt.savefig('gossip_comparison_final.png', dpi=120)
+    if os.environ.get('SHOW_PLOTS'):
+        plt.show()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
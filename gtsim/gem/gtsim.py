@@ -1,8 +1,12 @@
-import random
 import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from numba import njit
 
 # --- Simulation Parameters ---
 NUM_NODES = 5000
+NUM_NEIGHBORS = 5
 FANOUT = 5
 TOTAL_TIME_STEPS = 50
 NUM_SIMULATIONS = 20
@@ -12,39 +16,78 @@ INITIAL_REPUTATION = 100
 REPUTATION_BOOST = 10
 REPUTATION_PENALTY = 5
 
+# ====================================================================
+# Shared Network State
+# ====================================================================
+def random_neighbors(rng, num_nodes, degree):
+    """Draws `degree` distinct neighbors other than itself for every node."""
+    # Sampling from num_nodes - 1 ids and shifting those >= the row id up by
+    # one excludes self-loops without building a candidate list per node
+    adj = rng.integers(0, num_nodes - 1, size=(num_nodes, degree), dtype=np.int32)
+    rows = np.arange(num_nodes, dtype=np.int32)
+    while True:
+        sorted_adj = np.sort(adj, axis=1)
+        dup = (sorted_adj[:, 1:] == sorted_adj[:, :-1]).any(axis=1)
+        if not dup.any():
+            break
+        # Redraw only the (rare) rows that picked a neighbor twice
+        adj[dup] = rng.integers(0, num_nodes - 1, size=(int(dup.sum()), degree), dtype=np.int32)
+    adj += adj >= rows[:, None]
+    return adj
+
+class Network:
+    """Per-simulation state shared by all nodes, stored as flat arrays."""
+    def __init__(self, num_nodes, seed=None):
+        self.reputation = np.full(num_nodes, INITIAL_REPUTATION, dtype=np.float32)
+        self.rng = np.random.default_rng(seed)
+        self.adj = random_neighbors(self.rng, num_nodes, NUM_NEIGHBORS)  # Row i: neighbor ids of node i
+        self.infected = np.zeros(num_nodes, dtype=np.uint8)  # Each simulation spreads a single message
+        self.nodes = []  # Indexed by node_id
+
 # ====================================================================
 # Conventional Gossip Model
 # ====================================================================
 class ConventionalNode:
-    def __init__(self, node_id, neighbors):
+    def __init__(self, node_id, network):
         self.node_id = node_id
-        self.neighbors = neighbors
-        self.known_messages = set()
+        self.neighbor_ids = network.adj[node_id]
+        self.network = network
 
     def receive_message(self, message):
-        if message not in self.known_messages:
-            self.known_messages.add(message)
+        infected = self.network.infected
+        if not infected[self.node_id]:
+            infected[self.node_id] = 1
             return True
         return False
 
-    def gossip(self, message):
-        """Randomly selects FANOUT neighbors and forwards the message."""
+    def gossip(self, message, newly_infected):
+        """Randomly selects FANOUT neighbors and forwards the message.
+
+        Neighbors that learn the message for the first time are appended to
+        newly_infected.
+        """
         newly_infected_neighbors = 0
-        neighbors_to_send_to = random.sample(self.neighbors, min(FANOUT, len(self.neighbors)))
-        for neighbor in neighbors_to_send_to:
+        neighbor_ids = self.neighbor_ids
+        # Sending to every neighbor needs no sampling; the order is irrelevant
+        if len(neighbor_ids) > FANOUT:
+            neighbor_ids = self.network.rng.choice(neighbor_ids, size=FANOUT, replace=False)
+        nodes = self.network.nodes
+        for neighbor_id in neighbor_ids:
+            neighbor = nodes[neighbor_id]
             if neighbor.receive_message(message):
+                newly_infected.append(neighbor)
                 newly_infected_neighbors += 1
         return newly_infected_neighbors
 
-def run_conventional_simulation():
-    nodes = [ConventionalNode(i, []) for i in range(NUM_NODES)]
-    for node in nodes:
-        node.neighbors = random.sample([n for n in nodes if n != node], 5)
+def run_conventional_simulation(seed=None):
+    net = Network(NUM_NODES, seed)
+    nodes = net.nodes = [ConventionalNode(i, net) for i in range(NUM_NODES)]
 
     message = "block_001"
-    start_node = random.choice(nodes)
+    start_node = nodes[net.rng.integers(NUM_NODES)]
     start_node.receive_message(message)
     
+    frontier = [start_node]
     infected_nodes_count = 1
     total_messages_sent = 0
     propagation_times = []
@@ -52,18 +95,30 @@ def run_conventional_simulation():
     start_time = time.time()
     
     for t in range(TOTAL_TIME_STEPS):
-        current_infected = [node for node in nodes if message in node.known_messages]
-        for node in current_infected:
+        # Every infected node sends FANOUT messages per step, but with
+        # NUM_NEIGHBORS == FANOUT each gossip covers all of a node's neighbors,
+        # so only the nodes infected on the previous step (the frontier) can
+        # reach anyone new; the others' sends are only counted
+        total_messages_sent += (infected_nodes_count - len(frontier)) * FANOUT
+        next_frontier = []
+        for node in frontier:
             total_messages_sent += FANOUT
-            node.gossip(message)
+            node.gossip(message, next_frontier)
+            # Everyone has the message: the rest of this step would be wasted
+            if infected_nodes_count + len(next_frontier) == NUM_NODES:
+                break
         
-        newly_infected_count = sum(1 for node in nodes if message in node.known_messages)
-        if newly_infected_count > infected_nodes_count:
+        if next_frontier:
             propagation_times.append(t + 1)
-            infected_nodes_count = newly_infected_count
+            infected_nodes_count += len(next_frontier)
+        frontier = next_frontier
         
         if infected_nodes_count == NUM_NODES:
             break
+        if not frontier:
+            # Nothing can change any more; account for the remaining resends
+            total_messages_sent += infected_nodes_count * FANOUT * (TOTAL_TIME_STEPS - t - 1)
+            break
     
     end_time = time.time()
     
@@ -73,51 +128,106 @@ def run_conventional_simulation():
 # ====================================================================
 # Game-Theory Based Gossip Model
 # ====================================================================
+@njit(cache=True)
+def _gt_gossip_step(adj, reputation, infected, order, count, rand, boost, penalty):
+    """Runs one gossip round for the nodes in order[:count].
+
+    Each node picks rand.shape[1] neighbors with replacement, weighted by
+    reputation, using one row of rand per node. Newly infected ids are
+    appended to order. Returns the new infected count and the messages sent.
+    """
+    degree = adj.shape[1]
+    k = min(rand.shape[1], degree)
+    cum_weights = np.empty(degree, np.float64)
+    infected_count = count
+    messages_sent = 0
+    for i in range(count):
+        u = order[i]
+        total_reputation = 0.0
+        for j in range(degree):
+            total_reputation += reputation[adj[u, j]]
+        if total_reputation == 0:
+            continue
+
+        # Inverse-CDF sampling as random.choices does; reputations (and so
+        # the total) can go negative, which rules out a plain p= vector
+        acc = 0.0
+        for j in range(degree):
+            acc += reputation[adj[u, j]] / total_reputation
+            cum_weights[j] = acc
+        for s in range(k):
+            x = rand[i, s] * cum_weights[degree - 1]
+            lo = 0
+            hi = degree - 1
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if x < cum_weights[mid]:
+                    hi = mid
+                else:
+                    lo = mid + 1
+            v = adj[u, lo]
+            messages_sent += 1
+            if not infected[v]:
+                infected[v] = 1
+                order[infected_count] = v
+                infected_count += 1
+                reputation[v] += boost
+                reputation[u] += boost
+            else:
+                reputation[u] -= penalty
+        # Everyone has the message: the rest of the round would be wasted
+        if infected_count == infected.shape[0]:
+            break
+    return infected_count, messages_sent
+
 class GTNode:
-    def __init__(self, node_id, neighbors):
+    def __init__(self, node_id, network):
         self.node_id = node_id
-        self.neighbors = neighbors
-        self.known_messages = set()
-        self.reputation = INITIAL_REPUTATION
+        self.neighbor_ids = network.adj[node_id]
+        self.network = network
+
+    @property
+    def reputation(self):
+        return self.network.reputation[self.node_id]
+
+    @reputation.setter
+    def reputation(self, value):
+        self.network.reputation[self.node_id] = value
 
     def receive_message(self, message):
-        if message not in self.known_messages:
-            self.known_messages.add(message)
+        infected = self.network.infected
+        if not infected[self.node_id]:
+            infected[self.node_id] = 1
             return True
         return False
 
-    def gossip(self, message):
-        """Strategically chooses neighbors based on reputation."""
-        total_messages_sent = 0
-        
-        reputations = [n.reputation for n in self.neighbors]
-        total_reputation = sum(reputations)
-        
-        if total_reputation == 0:
-            return 0
-        
-        weights = [r / total_reputation for r in reputations]
-        
-        neighbors_to_send_to = random.choices(self.neighbors, weights=weights, k=min(FANOUT, len(self.neighbors)))
-        
-        for neighbor in neighbors_to_send_to:
-            total_messages_sent += 1
-            if neighbor.receive_message(message):
-                neighbor.reputation += REPUTATION_BOOST
-                self.reputation += REPUTATION_BOOST
-            else:
-                self.reputation -= REPUTATION_PENALTY
-        return total_messages_sent
+    def gossip(self, message, newly_infected):
+        """Strategically chooses neighbors based on reputation.
 
-def run_gt_simulation():
-    nodes = [GTNode(i, []) for i in range(NUM_NODES)]
-    for node in nodes:
-        node.neighbors = random.sample([n for n in nodes if n != node], 5)
+        Neighbors that learn the message for the first time are appended to
+        newly_infected.
+        """
+        net = self.network
+        order = np.empty(1 + FANOUT, dtype=np.int32)
+        order[0] = self.node_id
+        infected_count, messages_sent = _gt_gossip_step(
+            net.adj, net.reputation, net.infected, order, 1,
+            net.rng.random((1, FANOUT)), REPUTATION_BOOST, REPUTATION_PENALTY)
+        newly_infected.extend(net.nodes[i] for i in order[1:infected_count])
+        return messages_sent
+
+def run_gt_simulation(seed=None):
+    net = Network(NUM_NODES, seed)
+    nodes = net.nodes = [GTNode(i, net) for i in range(NUM_NODES)]
 
     message = "block_001"
-    start_node = random.choice(nodes)
+    start_node = nodes[net.rng.integers(NUM_NODES)]
     start_node.receive_message(message)
     
+    # Infected ids in infection order; each step gossips from the first
+    # infected_nodes_count of them and appends the newly infected after
+    infected = np.empty(NUM_NODES, dtype=np.int32)
+    infected[0] = start_node.node_id
     infected_nodes_count = 1
     total_messages_sent = 0
     propagation_times = []
@@ -125,14 +235,15 @@ def run_gt_simulation():
     start_time = time.time()
 
     for t in range(TOTAL_TIME_STEPS):
-        current_infected = [node for node in nodes if message in node.known_messages]
-        for node in current_infected:
-            total_messages_sent += node.gossip(message)
+        rand = net.rng.random((infected_nodes_count, FANOUT))
+        new_count, messages_sent = _gt_gossip_step(
+            net.adj, net.reputation, net.infected, infected, infected_nodes_count,
+            rand, REPUTATION_BOOST, REPUTATION_PENALTY)
+        total_messages_sent += messages_sent
         
-        newly_infected_count = sum(1 for node in nodes if message in node.known_messages)
-        if newly_infected_count > infected_nodes_count:
+        if new_count > infected_nodes_count:
             propagation_times.append(t + 1)
-            infected_nodes_count = newly_infected_count
+            infected_nodes_count = new_count
         
         if infected_nodes_count == NUM_NODES:
             break
@@ -142,6 +253,13 @@ def run_gt_simulation():
     final_time_step = propagation_times[-1] if propagation_times else TOTAL_TIME_STEPS
     return final_time_step, total_messages_sent, end_time - start_time
 
+def warm_up():
+    """Compiles (or loads from cache) the GT kernel, so no timed run pays for it."""
+    net = Network(2 * NUM_NEIGHBORS)  # Same array dtypes as a full-size run
+    order = np.zeros(1 + FANOUT, dtype=np.int32)
+    _gt_gossip_step(net.adj, net.reputation, net.infected, order, 1,
+                    net.rng.random((1, FANOUT)), REPUTATION_BOOST, REPUTATION_PENALTY)
+
 # ====================================================================
 # Main Execution and Comparison
 # ====================================================================
@@ -153,8 +271,15 @@ if __name__ == "__main__":
     conv_redundancy = []
     conv_duration = []
 
-    for _ in range(NUM_SIMULATIONS):
-        time_steps, messages_sent, duration = run_conventional_simulation()
+    # Simulations are independent, so they run in parallel, each with its own seed
+    seeds = np.random.SeedSequence().generate_state(2 * NUM_SIMULATIONS).tolist()
+    with ProcessPoolExecutor(initializer=warm_up) as ex:
+        conv_runs = ex.map(run_conventional_simulation, seeds[:NUM_SIMULATIONS])
+        gt_runs = ex.map(run_gt_simulation, seeds[NUM_SIMULATIONS:])
+        conv_results = list(conv_runs)
+        gt_results = list(gt_runs)
+
+    for time_steps, messages_sent, duration in conv_results:
         conv_times.append(time_steps)
         conv_redundancy.append(messages_sent)
         conv_duration.append(duration)
@@ -163,8 +288,7 @@ if __name__ == "__main__":
     gt_redundancy = []
     gt_duration = []
 
-    for _ in range(NUM_SIMULATIONS):
-        time_steps, messages_sent, duration = run_gt_simulation()
+    for time_steps, messages_sent, duration in gt_results:
         gt_times.append(time_steps)
         gt_redundancy.append(messages_sent)
         gt_duration.append(duration)
@@ -1,3 +1,5 @@
+import heapq
+import operator
 import random
 import time
 
@@ -12,37 +14,100 @@ INITIAL_REPUTATION = 100
 REPUTATION_BOOST = 10
 REPUTATION_PENALTY = 5
 REPUTATION_DECAY_RATE = 0.99  # A decay factor applied each time step
+STRATEGIC_FANOUT = int(FANOUT * 0.6)  # Sends to the top-reputation neighbors
+RANDOM_FANOUT = FANOUT - STRATEGIC_FANOUT  # Sends to randomly chosen others
+DECAY_POW = [REPUTATION_DECAY_RATE ** k for k in range(TOTAL_TIME_STEPS + 1)]  # Decay over k steps
+
+# ====================================================================
+# Network Construction
+# ====================================================================
+def sample_neighbor_ids(node_id):
+    """Draws FANOUT distinct node ids other than node_id.
+
+    Rejection sampling touches O(FANOUT) ids instead of copying the whole
+    node list; with FANOUT << NUM_NODES repeats are rare.
+    """
+    picks = []
+    seen = {node_id}
+    while len(picks) < FANOUT:
+        candidate = random.randrange(NUM_NODES)
+        if candidate not in seen:
+            seen.add(candidate)
+            picks.append(candidate)
+    return picks
+
+def sample_topology():
+    """Draws the neighbor ids of every node; entry i lists node i's neighbors."""
+    return [sample_neighbor_ids(i) for i in range(NUM_NODES)]
+
+def build_network(node_class, topology=None):
+    """Creates NUM_NODES nodes of node_class wired as in topology.
+
+    A fresh random topology is drawn when none is given. All nodes share one
+    infected mask, so a network hosts one simulation at a time;
+    reset_network() readies it for the next.
+    """
+    if topology is None:
+        topology = sample_topology()
+    infected = bytearray(NUM_NODES)
+    nodes = [node_class(i, [], infected) for i in range(NUM_NODES)]
+    for node, neighbor_ids in zip(nodes, topology):
+        node.neighbors = [nodes[j] for j in neighbor_ids]
+    return nodes
+
+def reset_network(nodes):
+    """Clears per-run state while keeping the topology."""
+    infected = nodes[0].infected
+    infected[:] = bytes(len(infected))  # In place: every node holds this mask
+    for node in nodes:
+        node.reset()
 
 # ====================================================================
 # Conventional Gossip Model
 # ====================================================================
 class ConventionalNode:
-    def __init__(self, node_id, neighbors):
+    def __init__(self, node_id, neighbors, infected):
         self.node_id = node_id
         self.neighbors = neighbors
-        self.known_messages = set()
+        self.infected = infected  # Shared per-simulation mask, one byte per node
+
+    def reset(self):
+        # All per-run state lives in the shared infected mask
+        pass
 
     def receive_message(self, message):
-        if message not in self.known_messages:
-            self.known_messages.add(message)
+        infected = self.infected
+        if not infected[self.node_id]:
+            infected[self.node_id] = 1
             return True
         return False
 
-    def gossip(self, message):
-        """Randomly selects FANOUT neighbors and forwards the message."""
-        neighbors_to_send_to = random.sample(self.neighbors, min(FANOUT, len(self.neighbors)))
+    def gossip(self, message, newly_infected):
+        """Randomly selects FANOUT neighbors and forwards the message.
+
+        Neighbors that learn the message for the first time are appended to
+        newly_infected.
+        """
+        neighbors_to_send_to = self.neighbors
+        # Sending to every neighbor needs no sampling; the order is irrelevant
+        if len(neighbors_to_send_to) > FANOUT:
+            neighbors_to_send_to = random.sample(neighbors_to_send_to, FANOUT)
         for neighbor in neighbors_to_send_to:
-            neighbor.receive_message(message)
+            if neighbor.receive_message(message):
+                newly_infected.append(neighbor)
 
-def run_conventional_simulation():
-    nodes = [ConventionalNode(i, []) for i in range(NUM_NODES)]
-    for node in nodes:
-        node.neighbors = random.sample([n for n in nodes if n != node], FANOUT)
+def run_conventional_simulation(nodes=None):
+    # Pass a network from build_network() to reuse its topology across runs
+    if nodes is None:
+        nodes = build_network(ConventionalNode)
+    else:
+        reset_network(nodes)
 
     message = "block_001"
     start_node = random.choice(nodes)
     start_node.receive_message(message)
     
+    frontier = [start_node]
     infected_nodes_count = 1
     total_messages_sent = 0
     propagation_times = []
@@ -50,18 +115,25 @@ def run_conventional_simulation():
     start_time = time.time()
     
     for t in range(TOTAL_TIME_STEPS):
-        current_infected = [node for node in nodes if message in node.known_messages]
-        total_messages_sent += len(current_infected) * FANOUT
-        for node in current_infected:
-            node.gossip(message)
+        # Every infected node sends FANOUT messages per step, but each gossip
+        # covers all of a node's FANOUT neighbors, so only the nodes infected
+        # on the previous step (the frontier) can reach anyone new
+        total_messages_sent += infected_nodes_count * FANOUT
+        next_frontier = []
+        for node in frontier:
+            node.gossip(message, next_frontier)
         
-        newly_infected_count = sum(1 for node in nodes if message in node.known_messages)
-        if newly_infected_count > infected_nodes_count:
+        if next_frontier:
             propagation_times.append(t + 1)
-            infected_nodes_count = newly_infected_count
+            infected_nodes_count += len(next_frontier)
+        frontier = next_frontier
         
         if infected_nodes_count == NUM_NODES:
             break
+        if not frontier:
+            # Nothing can change any more; account for the remaining resends
+            total_messages_sent += infected_nodes_count * FANOUT * (TOTAL_TIME_STEPS - t - 1)
+            break
     
     end_time = time.time()
     
@@ -71,53 +143,89 @@ def run_conventional_simulation():
 # ====================================================================
 # Game-Theory Based Gossip Model
 # ====================================================================
+by_reputation = operator.attrgetter('reputation')  # C-level sort key
+
 class GTNode:
-    def __init__(self, node_id, neighbors):
+    def __init__(self, node_id, neighbors, infected):
         self.node_id = node_id
         self.neighbors = neighbors
-        self.known_messages = set()
+        self.infected = infected  # Shared per-simulation mask, one byte per node
         self.reputation = INITIAL_REPUTATION
+        self.decayed_steps = 0  # Number of per-step decays already applied to reputation
+
+    def reset(self):
+        self.reputation = INITIAL_REPUTATION
+        self.decayed_steps = 0
+
+    def apply_decay(self, decay_steps):
+        """Brings reputation up to date with the first decay_steps per-step decays.
+
+        Clamping at INITIAL_REPUTATION after each step is the same as clamping
+        once after all of them, so pending decays collapse to one multiply.
+        """
+        pending = decay_steps - self.decayed_steps
+        if pending:
+            self.reputation = max(INITIAL_REPUTATION, self.reputation * DECAY_POW[pending])
+            self.decayed_steps = decay_steps
 
     def receive_message(self, message):
-        if message not in self.known_messages:
-            self.known_messages.add(message)
+        infected = self.infected
+        if not infected[self.node_id]:
+            infected[self.node_id] = 1
             return True
         return False
 
-    def gossip(self, message):
-        """Strategically chooses neighbors based on reputation, with a hybrid approach."""
-        
-        # Sort neighbors by reputation
-        sorted_neighbors = sorted(self.neighbors, key=lambda n: n.reputation, reverse=True)
+    def gossip(self, message, newly_infected, decay_steps):
+        """Strategically chooses neighbors based on reputation, with a hybrid approach.
+
+        Neighbors that learn the message for the first time are appended to
+        newly_infected. Reputations are read as of decay_steps decays.
+        """
+        # Decay is applied lazily, only to the nodes whose reputation is used
+        self.apply_decay(decay_steps)
+        for neighbor in self.neighbors:
+            neighbor.apply_decay(decay_steps)
         
-        # Select top-reputation neighbors (e.g., top 60%)
-        strategic_fanout = int(FANOUT * 0.6)
-        strategic_choices = sorted_neighbors[:strategic_fanout]
+        # Select top-reputation neighbors (e.g., top 60%); a partial top-k
+        # selection is all that is needed, not a full sort
+        strategic_choices = heapq.nlargest(STRATEGIC_FANOUT, self.neighbors, key=by_reputation)
         
         # Select remaining randomly
-        remaining_neighbors = sorted_neighbors[strategic_fanout:]
-        random_fanout = FANOUT - strategic_fanout
-        random_choices = random.sample(remaining_neighbors, min(random_fanout, len(remaining_neighbors)))
+        remaining_neighbors = [n for n in self.neighbors if n not in strategic_choices]
+        if len(remaining_neighbors) <= RANDOM_FANOUT:
+            # With FANOUT neighbors every remaining one is picked; sampling
+            # would only shuffle them, and send order within a node is moot
+            random_choices = remaining_neighbors
+        else:
+            random_choices = random.sample(remaining_neighbors, RANDOM_FANOUT)
         
         # Combine choices
         neighbors_to_send_to = strategic_choices + random_choices
         
+        boost = REPUTATION_BOOST
+        penalty = REPUTATION_PENALTY
+        reputation_change = 0
         for neighbor in neighbors_to_send_to:
             if neighbor.receive_message(message):
-                neighbor.reputation += REPUTATION_BOOST
-                self.reputation += REPUTATION_BOOST
+                newly_infected.append(neighbor)
+                neighbor.reputation += boost
+                reputation_change += boost
             else:
-                self.reputation -= REPUTATION_PENALTY
+                reputation_change -= penalty
+        self.reputation += reputation_change
 
-def run_gt_simulation():
-    nodes = [GTNode(i, []) for i in range(NUM_NODES)]
-    for node in nodes:
-        node.neighbors = random.sample([n for n in nodes if n != node], FANOUT)
+def run_gt_simulation(nodes=None):
+    # Pass a network from build_network() to reuse its topology across runs
+    if nodes is None:
+        nodes = build_network(GTNode)
+    else:
+        reset_network(nodes)
 
     message = "block_001"
     start_node = random.choice(nodes)
     start_node.receive_message(message)
     
+    frontier = [start_node]
     infected_nodes_count = 1
     total_messages_sent = 0
     propagation_times = []
@@ -125,22 +233,26 @@ def run_gt_simulation():
     start_time = time.time()
 
     for t in range(TOTAL_TIME_STEPS):
-        # Apply reputation decay
-        for node in nodes:
-            node.reputation = max(INITIAL_REPUTATION, node.reputation * REPUTATION_DECAY_RATE)
-
-        current_infected = [node for node in nodes if message in node.known_messages]
-        total_messages_sent += len(current_infected) * FANOUT
-        for node in current_infected:
-            node.gossip(message)
+        # Every infected node sends FANOUT messages per step, but each gossip
+        # covers all of a node's FANOUT neighbors, so only the nodes infected
+        # on the previous step (the frontier) can reach anyone new
+        total_messages_sent += infected_nodes_count * FANOUT
+        next_frontier = []
+        for node in frontier:
+            # Each step starts with one reputation decay, so t + 1 have elapsed
+            node.gossip(message, next_frontier, t + 1)
         
-        newly_infected_count = sum(1 for node in nodes if message in node.known_messages)
-        if newly_infected_count > infected_nodes_count:
+        if next_frontier:
             propagation_times.append(t + 1)
-            infected_nodes_count = newly_infected_count
+            infected_nodes_count += len(next_frontier)
+        frontier = next_frontier
         
         if infected_nodes_count == NUM_NODES:
             break
+        if not frontier:
+            # Nothing can change any more; account for the remaining resends
+            total_messages_sent += infected_nodes_count * FANOUT * (TOTAL_TIME_STEPS - t - 1)
+            break
             
     end_time = time.time()
 
@@ -154,12 +266,18 @@ if __name__ == "__main__":
     
     print("Running simulations...")
     
+    # Both models run on one shared topology, so their comparison is paired and
+    # averages are over start nodes and gossip choices rather than over graphs
+    topology = sample_topology()
+    conv_nodes = build_network(ConventionalNode, topology)
+    gt_nodes = build_network(GTNode, topology)
+
     conv_times = []
     conv_redundancy = []
     conv_duration = []
 
     for _ in range(NUM_SIMULATIONS):
-        time_steps, messages_sent, duration = run_conventional_simulation()
+        time_steps, messages_sent, duration = run_conventional_simulation(conv_nodes)
         conv_times.append(time_steps)
         conv_redundancy.append(messages_sent)
         conv_duration.append(duration)
@@ -169,7 +287,7 @@ if __name__ == "__main__":
     gt_duration = []
 
     for _ in range(NUM_SIMULATIONS):
-        time_steps, messages_sent, duration = run_gt_simulation()
+        time_steps, messages_sent, duration = run_gt_simulation(gt_nodes)
         gt_times.append(time_steps)
         gt_redundancy.append(messages_sent)
         gt_duration.append(duration)
@@ -1,5 +1,8 @@
-import random
 import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from numba import njit
 
 # --- Simulation Parameters ---
 NUM_NODES = 5000
@@ -16,141 +19,122 @@ REPUTATION_BOOST_SUCCESS = 10  # Reward for successfully informing a new peer
 REPUTATION_PENALTY_REDUNDANCY = 5 # Penalty for sending to an already-informed peer
 REPUTATION_DECAY_RATE = 0.99  # A decay factor applied each time step
 
+# Protocol modes
+MODE_CONVENTIONAL = 0  # Plain gossip
+MODE_GAME = 1          # Gossip with reputation rewards, penalties and decay
+
 # ====================================================================
-# Conventional Gossip Model
+# Network State (struct of arrays)
 # ====================================================================
-class ConventionalNode:
-    def __init__(self, node_id, neighbors):
-        self.node_id = node_id
-        self.neighbors = neighbors
-        self.known_messages = set()
-
-    def receive_message(self, message):
-        if message not in self.known_messages:
-            self.known_messages.add(message)
-            return True
-        return False
-
-    def gossip(self, message):
-        """Randomly selects FANOUT neighbors and forwards the message."""
-        neighbors_to_send_to = random.sample(self.neighbors, min(FANOUT, len(self.neighbors)))
-        for neighbor in neighbors_to_send_to:
-            neighbor.receive_message(message)
-
-def run_conventional_simulation():
-    nodes = [ConventionalNode(i, []) for i in range(NUM_NODES)]
-    for node in nodes:
-        node.neighbors = random.sample([n for n in nodes if n != node], FANOUT)
-
-    message = "block_001"
-    start_node = random.choice(nodes)
-    start_node.receive_message(message)
-    
-    infected_nodes_count = 1
+def random_neighbors(rng):
+    """Draws FANOUT distinct neighbors other than itself for every node.
+
+    Returns a (NUM_NODES, FANOUT) int32 array; row i holds node i's neighbors.
+    """
+    # Sampling from NUM_NODES - 1 ids and shifting those >= the row id up by
+    # one excludes self-loops without building a candidate list per node
+    nbrs = rng.integers(0, NUM_NODES - 1, size=(NUM_NODES, FANOUT), dtype=np.int32)
+    while True:
+        sorted_nbrs = np.sort(nbrs, axis=1)
+        dup = (sorted_nbrs[:, 1:] == sorted_nbrs[:, :-1]).any(axis=1)
+        if not dup.any():
+            break
+        # Redraw only the (rare) rows that picked a neighbor twice
+        nbrs[dup] = rng.integers(0, NUM_NODES - 1, size=(int(dup.sum()), FANOUT), dtype=np.int32)
+    nbrs += nbrs >= np.arange(NUM_NODES, dtype=np.int32)[:, None]
+    return nbrs
+
+@njit(cache=True)
+def _simulate(nbrs, start_node, mode, reputation):
+    """Spreads one message from start_node over the neighbor matrix.
+
+    Each gossip sends to all FANOUT neighbors of a node (for GT, the top 60%
+    by reputation plus a random pick of the rest is still all of them), so
+    only nodes infected on the previous step can reach anyone new. In
+    MODE_GAME, reputation is decayed, boosted and penalised in place.
+    Returns (final_time_step, total_messages_sent).
+    """
+    n, fanout = nbrs.shape
+    infected = np.zeros(n, np.bool_)
+    order = np.empty(n, np.int32)  # Infected ids in infection order
+    infected[start_node] = True
+    order[0] = start_node
+    lo, hi = 0, 1  # The frontier is order[lo:hi]
     total_messages_sent = 0
-    propagation_times = []
-    
-    start_time = time.time()
-    
+    final_time_step = TOTAL_TIME_STEPS
+
     for t in range(TOTAL_TIME_STEPS):
-        current_infected = [node for node in nodes if message in node.known_messages]
-        total_messages_sent += len(current_infected) * FANOUT
-        for node in current_infected:
-            node.gossip(message)
-        
-        newly_infected_count = sum(1 for node in nodes if message in node.known_messages)
-        if newly_infected_count > infected_nodes_count:
-            propagation_times.append(t + 1)
-            infected_nodes_count = newly_infected_count
-        
-        if infected_nodes_count == NUM_NODES:
+        if mode == MODE_GAME:
+            # Apply reputation decay
+            for i in range(n):
+                reputation[i] = max(INITIAL_REPUTATION, reputation[i] * REPUTATION_DECAY_RATE)
+
+        # Every infected node counts FANOUT sends per step
+        total_messages_sent += hi * fanout
+        new_hi = hi
+        for k in range(lo, hi):
+            u = order[k]
+            for j in range(fanout):
+                v = nbrs[u, j]
+                if not infected[v]:
+                    infected[v] = True
+                    order[new_hi] = v
+                    new_hi += 1
+                    if mode == MODE_GAME:
+                        reputation[v] += REPUTATION_BOOST_SUCCESS
+                        reputation[u] += REPUTATION_BOOST_SUCCESS
+                elif mode == MODE_GAME:
+                    reputation[u] -= REPUTATION_PENALTY_REDUNDANCY
+
+        if new_hi > hi:
+            final_time_step = t + 1
+        lo, hi = hi, new_hi
+
+        if hi == n:
+            break
+        if lo == hi:
+            # Nothing can change any more; account for the remaining resends
+            total_messages_sent += hi * fanout * (TOTAL_TIME_STEPS - t - 1)
             break
+    return final_time_step, total_messages_sent
+
+# ====================================================================
+# Conventional Gossip Model
+# ====================================================================
+def run_conventional_simulation(seed=None):
+    rng = np.random.default_rng(seed)
+    nbrs = random_neighbors(rng)
+    start_node = rng.integers(NUM_NODES)
     
+    start_time = time.time()
+    final_time_step, total_messages_sent = _simulate(
+        nbrs, start_node, MODE_CONVENTIONAL, np.empty(0, dtype=np.float32))
     end_time = time.time()
     
-    final_time_step = propagation_times[-1] if propagation_times else TOTAL_TIME_STEPS
     return final_time_step, total_messages_sent, end_time - start_time
 
 # ====================================================================
 # Game-Theory Based Gossip Model
 # ====================================================================
-class GTNode:
-    def __init__(self, node_id, neighbors):
-        self.node_id = node_id
-        self.neighbors = neighbors
-        self.known_messages = set()
-        self.reputation = INITIAL_REPUTATION
-
-    def receive_message(self, message):
-        if message not in self.known_messages:
-            self.known_messages.add(message)
-            return True
-        return False
-
-    def gossip(self, message):
-        """Strategically chooses neighbors based on reputation, with a hybrid approach."""
-        
-        # Sort neighbors by reputation
-        sorted_neighbors = sorted(self.neighbors, key=lambda n: n.reputation, reverse=True)
-        
-        # Select top-reputation neighbors (e.g., top 60%)
-        strategic_fanout = int(FANOUT * 0.6)
-        strategic_choices = sorted_neighbors[:strategic_fanout]
-        
-        # Select remaining randomly
-        remaining_neighbors = sorted_neighbors[strategic_fanout:]
-        random_fanout = FANOUT - strategic_fanout
-        random_choices = random.sample(remaining_neighbors, min(random_fanout, len(remaining_neighbors)))
-        
-        # Combine choices
-        neighbors_to_send_to = strategic_choices + random_choices
-        
-        for neighbor in neighbors_to_send_to:
-            if neighbor.receive_message(message):
-                neighbor.reputation += REPUTATION_BOOST_SUCCESS
-                self.reputation += REPUTATION_BOOST_SUCCESS
-            else:
-                self.reputation -= REPUTATION_PENALTY_REDUNDANCY
-
-def run_gt_simulation():
-    nodes = [GTNode(i, []) for i in range(NUM_NODES)]
-    for node in nodes:
-        node.neighbors = random.sample([n for n in nodes if n != node], FANOUT)
-
-    message = "block_001"
-    start_node = random.choice(nodes)
-    start_node.receive_message(message)
-    
-    infected_nodes_count = 1
-    total_messages_sent = 0
-    propagation_times = []
+def run_gt_simulation(seed=None):
+    rng = np.random.default_rng(seed)
+    nbrs = random_neighbors(rng)
+    reputation = np.full(NUM_NODES, INITIAL_REPUTATION, dtype=np.float32)
+    start_node = rng.integers(NUM_NODES)
     
     start_time = time.time()
-
-    for t in range(TOTAL_TIME_STEPS):
-        # Apply reputation decay
-        for node in nodes:
-            node.reputation = max(INITIAL_REPUTATION, node.reputation * REPUTATION_DECAY_RATE)
-
-        current_infected = [node for node in nodes if message in node.known_messages]
-        # Count messages sent only if they are being forwarded
-        total_messages_sent += len(current_infected) * FANOUT
-        for node in current_infected:
-            node.gossip(message)
-        
-        newly_infected_count = sum(1 for node in nodes if message in node.known_messages)
-        if newly_infected_count > infected_nodes_count:
-            propagation_times.append(t + 1)
-            infected_nodes_count = newly_infected_count
-        
-        if infected_nodes_count == NUM_NODES:
-            break
-            
+    final_time_step, total_messages_sent = _simulate(nbrs, start_node, MODE_GAME, reputation)
     end_time = time.time()
 
-    final_time_step = propagation_times[-1] if propagation_times else TOTAL_TIME_STEPS
     return final_time_step, total_messages_sent, end_time - start_time
 
+def warm_up():
+    """Compiles (or loads from cache) the kernel, so no timed run pays for it."""
+    # Same argument types as a full-size run; both modes share one signature
+    nbrs = np.zeros((2, FANOUT), dtype=np.int32)
+    reputation = np.full(2, INITIAL_REPUTATION, dtype=np.float32)
+    _simulate(nbrs, np.int64(0), MODE_GAME, reputation)
+
 # ====================================================================
 # Main Execution and Comparison
 # ====================================================================
@@ -162,8 +146,15 @@ if __name__ == "__main__":
     conv_redundancy = []
     conv_duration = []
 
-    for _ in range(NUM_SIMULATIONS):
-        time_steps, messages_sent, duration = run_conventional_simulation()
+    # Simulations are independent, so they run in parallel, each with its own seed
+    seeds = np.random.SeedSequence().generate_state(2 * NUM_SIMULATIONS).tolist()
+    with ProcessPoolExecutor(initializer=warm_up) as ex:
+        conv_runs = ex.map(run_conventional_simulation, seeds[:NUM_SIMULATIONS])
+        gt_runs = ex.map(run_gt_simulation, seeds[NUM_SIMULATIONS:])
+        conv_results = list(conv_runs)
+        gt_results = list(gt_runs)
+
+    for time_steps, messages_sent, duration in conv_results:
         conv_times.append(time_steps)
         conv_redundancy.append(messages_sent)
         conv_duration.append(duration)
@@ -172,8 +163,7 @@ if __name__ == "__main__":
     gt_redundancy = []
     gt_duration = []
 
-    for _ in range(NUM_SIMULATIONS):
-        time_steps, messages_sent, duration = run_gt_simulation()
+    for time_steps, messages_sent, duration in gt_results:
         gt_times.append(time_steps)
         gt_redundancy.append(messages_sent)
         gt_duration.append(duration)